@@ -2,13 +2,10 @@ import streamlit as st
 import time
 import os
 import cv2
-import yt_dlp
-from yt_dlp.utils import download_range_func
-from moviepy.video.io.ffmpeg_tools import ffmpeg_extract_subclip
-from moviepy.editor import VideoFileClip
-from utils.video_processing import execute_video_processing, load_all_analyses
+from utils.video_processing import process_segments, probe_frame_size, has_audio_stream, split_segment
 from utils.analysis_cache import register_video_analysis, register_url_analysis
 import logging
+import functools
 import re  # Add this import for regex handling
 from utils.logging_utils import log_session_state, TimerLog
 
@@ -109,6 +106,7 @@ def show_analyze_page():
             
             # Clear previous analyses before starting new analysis
             st.session_state.current_analyses = []
+            st.session_state.analyses = []
             
             # Process either file or URL based on what was provided
             if st.session_state.file_or_url == "File" and st.session_state.video_file is not None:
@@ -164,12 +162,21 @@ def process_uploaded_file(video_file):
             f.write(video_file.getbuffer())
         logger.info(f"Saved video file to: {video_path}")
         
-        # Get video duration
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        video_duration = total_frames / fps
-        cap.release()
+        # Get video duration, reusing the metadata probed when the file was uploaded
+        video_duration = st.session_state.video_info.get("duration", 0)
+        if not video_duration:
+            cap = cv2.VideoCapture(video_path)
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            video_duration = total_frames / fps
+            cap.release()
+        
+        # Segments are stream-copied, so they all share the source frame size; probe it once
+        try:
+            frame_size = probe_frame_size(video_path)
+        except Exception as ex:
+            logger.warning(f"Could not probe frame size, segments will be probed individually: {ex}")
+            frame_size = None
         
         # Get configuration parameters
         segment_interval = st.session_state.config["segment_interval"]
@@ -193,10 +200,15 @@ def process_uploaded_file(video_file):
                 st.stop()
             video_duration = end_time - start_time
         
-        # Process video in segments
-        segment_num = 0
+        # Process video in segments; when transcribing, each cut also writes the segment's audio
         progress_bar = st.progress(0)
         segments_to_process = []
+        with_audio = False
+        if st.session_state.config["audio_transcription"]:
+            try:
+                with_audio = has_audio_stream(video_path)
+            except Exception as ex:
+                logger.warning(f"Could not probe audio of {video_path}, segments will extract their own: {ex}")
         
         # First, extract all segments
         for start_time_seg in range(int(start_time if enable_range else 0), 
@@ -209,7 +221,7 @@ def process_uploaded_file(video_file):
             
             # Extract segment
             try:
-                ffmpeg_extract_subclip(video_path, start_time_seg, end_time_seg, targetname=segment_path)
+                split_segment(video_path, start_time_seg, end_time_seg, segment_path, with_audio=with_audio)
                 logger.info(f"Successfully created segment: {segment_path}")
                 segments_to_process.append(segment_path)
             except Exception as ex:
@@ -220,21 +232,12 @@ def process_uploaded_file(video_file):
         total_segments = len(segments_to_process)
         logger.info(f"Processing video in {total_segments} segments")
         with TimerLog(logger, f"Processing all {total_segments} segments"):
-            for i, segment_path in enumerate(segments_to_process):
-                # Update progress
-                progress_percentage = int((i / total_segments) * 100)
-                progress_bar.progress(progress_percentage)
-                
-                # Process segment
-                try:
-                    execute_video_processing(
-                        st, segment_path, system_prompt, user_prompt, temperature,
-                        frames_per_second, analysis_subdir, segment_num, video_duration
-                    )
-                    segment_num += 1
-                except Exception as ex:
-                    logger.error(f"Error processing segment {i+1}: {str(ex)}")
-                    st.error(f"Error processing segment {i+1}: {str(ex)}")
+            results = process_segments(
+                st, segments_to_process, system_prompt, user_prompt, temperature,
+                frames_per_second, analysis_subdir, video_duration, progress_bar,
+                frame_size=frame_size
+            )
+            segment_num = sum(1 for result in results if result is not None)
         
         # Update progress to 100%
         progress_bar.progress(100)
@@ -246,9 +249,7 @@ def process_uploaded_file(video_file):
         except Exception as ex:
             logger.error(f"Error removing original video file: {str(ex)}")
         
-        # After all segments are processed, load all analyses
-        analyses = load_all_analyses(analysis_subdir)
-        st.session_state.analyses = analyses
+        # Analyses were collected in session state as each segment finished
         st.session_state.show_chat = True
         
         # Register this video in the cache system for future retrieval
@@ -264,6 +265,9 @@ def process_uploaded_file(video_file):
 
 def process_video_url(url):
     """Process a video from URL (e.g., YouTube)."""
+    # yt_dlp is only needed for URLs, so keep it out of the page's import cost
+    import yt_dlp
+
     try:
         logger.info(f"Starting URL processing for: {url}")
         # First get video info without downloading
@@ -321,73 +325,25 @@ def process_video_url(url):
             end_time = video_duration
             duration_to_process = video_duration
         
-        # Calculate number of segments
-        num_segments = (end_time - start_time) // segment_interval
-        if (end_time - start_time) % segment_interval > 0:
-            num_segments += 1
-        
-        # Process video in segments
+        # Segments are downloaded inside the processing pipeline, so later downloads overlap earlier analyses
         progress_bar = st.progress(0)
-        segment_num = 0
+        segments_to_process = [
+            os.path.join(segments_dir, f'segment_{start}-{min(start + segment_interval, end_time)}.mp4')
+            for start in range(start_time, end_time, segment_interval)
+        ]
         
-        for start in range(start_time, end_time, segment_interval):
-            end = min(start + segment_interval, end_time)
-            
-            # Update progress
-            progress_percentage = int((segment_num / num_segments) * 100)
-            progress_bar.progress(progress_percentage)
-            
-            # Create segment path
-            segment_path = os.path.join(segments_dir, f'segment_{start}-{end}.mp4')
-            
-            # Download segment
-            with st.spinner(f"Downloading segment {segment_num+1}/{num_segments} ({start}-{end} seconds)..."):
-                try:
-                    segment_ydl_opts = ydl_opts.copy()
-                    segment_ydl_opts['download_ranges'] = download_range_func(None, [(start, end)])
-                    segment_ydl_opts['outtmpl'] = segment_path
-                    
-                    with yt_dlp.YoutubeDL(segment_ydl_opts) as ydl:
-                        ydl.download([url])
-                    
-                    logger.info(f"Downloaded segment: {segment_path}")
-                    
-                    if not os.path.exists(segment_path):
-                        # Try with different extensions
-                        for ext in ['.webm', '.mkv']:
-                            alt_path = os.path.splitext(segment_path)[0] + ext
-                            if os.path.exists(alt_path):
-                                segment_path = alt_path
-                                break
-                    
-                    if not os.path.exists(segment_path):
-                        st.warning(f"Segment download successful but file not found. Check the segments directory.")
-                    
-                    # Process segment
-                    execute_video_processing(
-                        st, segment_path, system_prompt, user_prompt, temperature,
-                        frames_per_second, analysis_subdir, segment_num, duration_to_process
-                    )
-                    
-                    # Clean up segment file
-                    # try:
-                    #     os.remove(segment_path)
-                    #     logger.info(f"Removed segment file: {segment_path}")
-                    # except:
-                    #     logger.warning(f"Could not remove segment file: {segment_path}")
-                    
-                except Exception as ex:
-                    logger.error(f"Error processing segment {start}-{end}: {str(ex)}")
-                    st.error(f"Error processing segment {start}-{end}: {str(ex)}")
-            
-            segment_num += 1
+        with TimerLog(logger, f"Downloading and processing all {len(segments_to_process)} segments"):
+            results = process_segments(
+                st, segments_to_process, system_prompt, user_prompt, temperature,
+                frames_per_second, analysis_subdir, duration_to_process, progress_bar,
+                fetch_segment=functools.partial(download_url_segment, url, ydl_opts)
+            )
+            segment_num = sum(1 for result in results if result is not None)
         
         # Update progress to 100%
         progress_bar.progress(100)
         
-        # After all segments are processed, load all analyses
-        analyses = load_all_analyses(analysis_subdir)
-        st.session_state.analyses = analyses
+        # Analyses were collected in session state as each segment finished
         st.session_state.show_chat = True
         
         # Register this URL in the cache system for future retrieval
@@ -400,3 +356,30 @@ def process_video_url(url):
     except Exception as ex:
         logger.exception(f"Error processing URL: {str(ex)}")
         st.error(f"Error processing URL: {str(ex)}")
+
+def download_url_segment(url, ydl_opts, segment_path):
+    """Download the time range encoded in segment_path from a URL. Returns the path of the downloaded file."""
+    import yt_dlp
+    from yt_dlp.utils import download_range_func
+
+    timing = os.path.basename(segment_path).split('_')[-1].replace('.mp4', '')
+    start, end = map(int, timing.split('-'))
+    
+    segment_ydl_opts = ydl_opts.copy()
+    segment_ydl_opts['download_ranges'] = download_range_func(None, [(start, end)])
+    segment_ydl_opts['outtmpl'] = segment_path
+    
+    with yt_dlp.YoutubeDL(segment_ydl_opts) as ydl:
+        ydl.download([url])
+    
+    logger.info(f"Downloaded segment: {segment_path}")
+    
+    if not os.path.exists(segment_path):
+        # Try with different extensions
+        for ext in ['.webm', '.mkv']:
+            alt_path = os.path.splitext(segment_path)[0] + ext
+            if os.path.exists(alt_path):
+                return alt_path
+        raise FileNotFoundError(f"Segment download successful but file not found: {segment_path}")
+    
+    return segment_path
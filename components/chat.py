@@ -2,13 +2,34 @@ import streamlit as st
 import json
 import logging
 from utils.api_clients import update_api_clients
-from utils.analysis import chat_with_video_analysis
-from config import CHAT_SYSTEM_PROMPT
+from utils.analysis import chat_with_video_analysis, get_segment_contexts
+from config import CHAT_SYSTEM_PROMPT, CHAT_HISTORY_MAX_TURNS
 from utils.logging_utils import log_session_state, TimerLog
 
 # Set up logger for this component
 logger = logging.getLogger('chat')
 
+# api_config entries that are masked when shown or logged
+_API_KEY_KEYS = frozenset({"azure_api_key", "whisper_api_key"})
+
+def _update_config(config, key, value):
+    """Store a widget value in a config dict, writing (and logging) only when it changed."""
+    if key in config and config[key] == value:
+        return
+    if key in config:
+        if key in _API_KEY_KEYS:
+            logger.info(f"Config changed: {key}")
+        else:
+            logger.info(f"Config changed: {key} = {value} (was {config[key]})")
+    config[key] = value
+
+def _word_count(analysis):
+    """Get the word count of an analysis, counted once and stored on the analysis dict."""
+    word_count = analysis.get("_wc")
+    if word_count is None:
+        word_count = analysis["_wc"] = len(analysis.get("analysis", "").split())
+    return word_count
+
 def show_chat_page():
     """Display the chat interface."""
     logger.info("Rendering chat page")
@@ -28,7 +49,7 @@ def show_chat_page():
             options=model_options,
             index=model_options.index(st.session_state.chat_config.get("model", "gpt-4o")) if st.session_state.chat_config.get("model") in model_options else 0
         )
-        st.session_state.chat_config["model"] = selected_model
+        _update_config(st.session_state.chat_config, "model", selected_model)
         
         # Temperature slider with info tooltip
         temperature = st.slider(
@@ -39,22 +60,24 @@ def show_chat_page():
             step=0.1,
             help="Higher values make output more random, lower values more deterministic"
         )
-        st.session_state.chat_config["temperature"] = temperature
+        _update_config(st.session_state.chat_config, "temperature", temperature)
         
         # Context handling options
         st.subheader("Context Settings")
         
-        st.session_state.chat_config["summarize_first"] = st.checkbox(
+        summarize_first = st.checkbox(
             "Generate summary first",
             value=st.session_state.chat_config.get("summarize_first", True),
             help="Create a high-level summary of all segments before answering questions"
         )
+        _update_config(st.session_state.chat_config, "summarize_first", summarize_first)
         
-        st.session_state.chat_config["include_transcription"] = st.checkbox(
+        include_transcription = st.checkbox(
             "Include transcriptions in context",
             value=st.session_state.chat_config.get("include_transcription", True),
             help="Include audio transcriptions as part of the analysis context"
         )
+        _update_config(st.session_state.chat_config, "include_transcription", include_transcription)
         
         max_context = st.slider(
             "Max context length (segments)",
@@ -63,7 +86,7 @@ def show_chat_page():
             value=st.session_state.chat_config.get("max_context", len(st.session_state.analyses) if st.session_state.analyses else 5),
             help="Maximum number of analysis segments to include in context"
         )
-        st.session_state.chat_config["max_context"] = max_context
+        _update_config(st.session_state.chat_config, "max_context", max_context)
         
         # Action buttons
         st.markdown("---")
@@ -83,39 +106,11 @@ def show_chat_page():
             value=st.session_state.chat_config.get("expert_mode", False),
             help="Show advanced options and technical details"
         )
-        st.session_state.chat_config["expert_mode"] = expert_mode
+        _update_config(st.session_state.chat_config, "expert_mode", expert_mode)
         
         # Show additional expert options if enabled
         if expert_mode:
-            # System prompt customization
-            chat_system_prompt = st.text_area(
-                "System Prompt",
-                value=st.session_state.chat_config.get("chat_system_prompt", CHAT_SYSTEM_PROMPT),
-                height=100
-            )
-            st.session_state.chat_config["chat_system_prompt"] = chat_system_prompt
-            
-            # Model parameters
-            st.session_state.chat_config["max_tokens"] = st.number_input(
-                "Max Response Tokens",
-                min_value=100,
-                max_value=4096,
-                value=st.session_state.chat_config.get("max_tokens", 1000),
-                step=50
-            )
-            
-            # API Configuration Section
-            show_api_configuration()
-        
-        # Log configuration changes
-        old_config = getattr(st.session_state, '_previous_chat_config', None)
-        # Store current config for comparison next time
-        st.session_state._previous_chat_config = st.session_state.chat_config.copy()
-        
-        if old_config:
-            for key, value in st.session_state.chat_config.items():
-                if key in old_config and old_config[key] != value:
-                    logger.info(f"Chat config changed: {key} = {value} (was {old_config[key]})")
+            show_expert_options()
     
     # Main chat container
     st.header("💬 Chat about the video analysis")
@@ -124,6 +119,33 @@ def show_chat_page():
     logger.debug("Rendering chat interface")
     show_chat_interface()
 
+@st.fragment
+def show_expert_options():
+    """Display the advanced chat options and API configuration.
+
+    Runs as a fragment, so editing these settings reruns only this panel.
+    """
+    # System prompt customization
+    chat_system_prompt = st.text_area(
+        "System Prompt",
+        value=st.session_state.chat_config.get("chat_system_prompt", CHAT_SYSTEM_PROMPT),
+        height=100
+    )
+    _update_config(st.session_state.chat_config, "chat_system_prompt", chat_system_prompt)
+    
+    # Model parameters
+    max_tokens = st.number_input(
+        "Max Response Tokens",
+        min_value=100,
+        max_value=4096,
+        value=st.session_state.chat_config.get("max_tokens", 1000),
+        step=50
+    )
+    _update_config(st.session_state.chat_config, "max_tokens", max_tokens)
+    
+    # API Configuration Section
+    show_api_configuration()
+
 def show_api_configuration():
     """Display API configuration UI."""
     logger.debug("Rendering API configuration")
@@ -138,14 +160,14 @@ def show_api_configuration():
             value=st.session_state.api_config["azure_api_key"],
             placeholder="your-azure-openai-api-key"
         )
-        st.session_state.api_config["azure_api_key"] = azure_api_key
+        _update_config(st.session_state.api_config, "azure_api_key", azure_api_key)
         
         azure_endpoint = st.text_input(
             "Azure OpenAI Endpoint", 
             value=st.session_state.api_config["azure_endpoint"],
             placeholder="https://your-azure-openai-endpoint.openai.azure.com/"
         )
-        st.session_state.api_config["azure_endpoint"] = azure_endpoint
+        _update_config(st.session_state.api_config, "azure_endpoint", azure_endpoint)
         
         azure_deployment = st.text_input(
             "Azure Deployment Name", 
@@ -153,14 +175,14 @@ def show_api_configuration():
             placeholder="gpt-4o",
             help="This is your deployment name, e.g., gpt-4o"
         )
-        st.session_state.api_config["azure_deployment"] = azure_deployment
+        _update_config(st.session_state.api_config, "azure_deployment", azure_deployment)
         
         azure_api_version = st.text_input(
             "Azure API Version", 
             value=st.session_state.api_config["azure_api_version"],
             placeholder="2024-08-01-preview"
         )
-        st.session_state.api_config["azure_api_version"] = azure_api_version
+        _update_config(st.session_state.api_config, "azure_api_version", azure_api_version)
         
         st.markdown("[Get Azure OpenAI access](https://azure.microsoft.com/en-us/products/cognitive-services/openai-service)")
     
@@ -173,14 +195,14 @@ def show_api_configuration():
             value=st.session_state.api_config["whisper_api_key"],
             placeholder="your-whisper-api-key"
         )
-        st.session_state.api_config["whisper_api_key"] = whisper_api_key
+        _update_config(st.session_state.api_config, "whisper_api_key", whisper_api_key)
         
         whisper_endpoint = st.text_input(
             "Whisper Endpoint", 
             value=st.session_state.api_config["whisper_endpoint"],
             placeholder="https://your-whisper-endpoint.openai.azure.com/"
         )
-        st.session_state.api_config["whisper_endpoint"] = whisper_endpoint
+        _update_config(st.session_state.api_config, "whisper_endpoint", whisper_endpoint)
         
         whisper_deployment = st.text_input(
             "Whisper Deployment Name", 
@@ -188,14 +210,14 @@ def show_api_configuration():
             placeholder="whisper",
             help="This is your whisper deployment name"
         )
-        st.session_state.api_config["whisper_deployment"] = whisper_deployment
+        _update_config(st.session_state.api_config, "whisper_deployment", whisper_deployment)
         
         whisper_api_version = st.text_input(
             "Whisper API Version", 
             value=st.session_state.api_config["whisper_api_version"],
             placeholder="2023-09-01-preview"
         )
-        st.session_state.api_config["whisper_api_version"] = whisper_api_version
+        _update_config(st.session_state.api_config, "whisper_api_version", whisper_api_version)
     
     # Apply Changes button
     if st.button("Apply API Changes", use_container_width=True):
@@ -222,9 +244,9 @@ def show_api_configuration():
     if st.button("Debug API Settings", use_container_width=True):
         st.write("Current API Configuration:")
         for key, value in st.session_state.api_config.items():
-            if value and "api_key" in key:
+            if value and key in _API_KEY_KEYS:
                 # Mask API keys for security
-                masked = value[:4] + "..." + value[-4:] if len(value) > 8 else "***"
+                masked = f"{value[:4]}...{value[-4:]}" if len(value) > 8 else "***"
                 st.write(f"{key}: {masked}")
             else:
                 st.write(f"{key}: {value}")
@@ -235,21 +257,28 @@ def show_api_configuration():
         
         # Count total tokens in context
         max_context = st.session_state.chat_config.get("max_context", len(st.session_state.analyses))
-        context_size = sum(len(analysis.get("analysis", "").split()) for analysis in st.session_state.analyses[:max_context])
-        st.write(f"Analysis segments: {len(st.session_state.analyses[:max_context])}")
+        context_analyses = st.session_state.analyses[-max_context:]
+        context_size = sum(_word_count(analysis) for analysis in context_analyses)
+        st.write(f"Analysis segments: {len(context_analyses)}")
         st.write(f"Approximate context size: ~{context_size} words")
         
         # Show most recent chat history entries
-        if st.session_state.chat_history:
-            st.write(f"Chat history entries: {len(st.session_state.chat_history)}")
-            if len(st.session_state.chat_history) > 0:
-                last_msg = next((m for m in reversed(st.session_state.chat_history) if m["role"] == "user"), None)
+        history = st.session_state.chat_history
+        if history:
+            st.write(f"Chat history entries: {len(history)}")
+            if len(history) > 0:
+                last_msg = next((m for m in reversed(history) if m["role"] == "user"), None)
                 if last_msg:
                     st.write(f"Latest user query: '{last_msg['content'][:50]}...' ({len(last_msg['content'].split())} words)")
 
+@st.fragment
 def show_chat_interface():
-    """Display the chat interface with message history and input."""
-    logger.debug(f"Rendering chat interface with {len(st.session_state.chat_history)} messages")
+    """Display the chat interface with message history and input.
+
+    Runs as a fragment, so sending a message reruns only the chat panel and not the sidebar.
+    """
+    history = st.session_state.chat_history
+    logger.debug(f"Rendering chat interface with {len(history)} messages")
     
     # Chat interface with fixed scrolling region
     st.markdown('<div class="chat-container">', unsafe_allow_html=True)
@@ -258,7 +287,7 @@ def show_chat_interface():
     st.markdown('<div class="messages-container">', unsafe_allow_html=True)
     
     # Display chat history
-    for message in st.session_state.chat_history:
+    for message in history:
         with st.chat_message(message["role"]):
             st.write(message["content"])
             
@@ -276,10 +305,17 @@ def show_chat_interface():
     
     st.markdown('</div>', unsafe_allow_html=True)  # Close input container
 
+def _iter_response_text(response):
+    """Yield the text deltas of a streaming chat completion."""
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
 def handle_chat_input(prompt):
     """Handle user chat input."""
     logger.info(f"New chat input received: {prompt[:50]}..." + ("" if len(prompt) <= 50 else ""))
     logger.debug(f"Full user prompt: {prompt}")
+    history = st.session_state.chat_history
     
     with st.chat_message("user"):
         st.write(prompt)
@@ -289,10 +325,13 @@ def handle_chat_input(prompt):
         full_response = ""
         
         # Get settings from session state
-        logger.debug(f"Using model settings: temp={st.session_state.chat_config.get('temperature')}, summarize={st.session_state.chat_config.get('summarize_first')}, max_context={st.session_state.chat_config.get('max_context')}")
-        temperature = st.session_state.chat_config.get("temperature", 0.7)
-        summarize_first = st.session_state.chat_config.get("summarize_first", False)
-        max_context = st.session_state.chat_config.get("max_context", len(st.session_state.analyses))
+        chat_config = st.session_state.chat_config
+        analyses = st.session_state.analyses
+        temperature = chat_config.get("temperature", 0.7)
+        summarize_first = chat_config.get("summarize_first", False)
+        max_context = chat_config.get("max_context", len(analyses))
+        include_transcription = chat_config.get("include_transcription", True)
+        logger.debug(f"Using model settings: temp={temperature}, summarize={summarize_first}, max_context={max_context}")
         
         # Make sure clients are properly initialized before use
         if not hasattr(st.session_state, 'aoai_client') or st.session_state.aoai_client is None:
@@ -304,12 +343,13 @@ def handle_chat_input(prompt):
             try:
                 logger.debug("Starting chat request")
                 with TimerLog(logger, "Processing chat request"):
-                    # Limit context to max_context segments
-                    limited_analyses = st.session_state.analyses[:max_context] if max_context < len(st.session_state.analyses) else st.session_state.analyses
+                    # Limit context to the most recent max_context segments
+                    limited_analyses = analyses[-max_context:]
+                    segment_contexts = get_segment_contexts(limited_analyses, include_transcription)
                     
-                    # Get chat history formatted for API
+                    # Get the most recent chat turns formatted for API (a turn is a user and an assistant message)
                     api_messages = []
-                    for msg in st.session_state.chat_history:
+                    for msg in history[-2 * CHAT_HISTORY_MAX_TURNS:]:
                         if msg["role"] in ["user", "assistant"]:
                             api_messages.append({"role": msg["role"], "content": msg["content"]})
                     
@@ -319,21 +359,16 @@ def handle_chat_input(prompt):
                         analyses=limited_analyses,
                         chat_history=api_messages,
                         temperature=temperature,
-                        summarize_first=summarize_first
+                        summarize_first=summarize_first,
+                        segment_contexts=segment_contexts
                     )
                     
                     # Process streaming response
                     if isinstance(response, str):  # Error message returned
                         full_response = response
                         message_placeholder.error(full_response)
-                    else:  # Stream the response
-                        for chunk in response:
-                            if hasattr(chunk.choices[0].delta, 'content') and chunk.choices[0].delta.content is not None:
-                                full_response += chunk.choices[0].delta.content
-                                message_placeholder.markdown(full_response + "▌")
-                        
-                        # Display final response without cursor
-                        message_placeholder.markdown(full_response)
+                    else:  # Stream the response; Streamlit batches the re-renders
+                        full_response = message_placeholder.write_stream(_iter_response_text(response))
                 
                 logger.info(f"Chat response generated, length: {len(full_response)}")
                 preview_length = 500
@@ -358,4 +393,4 @@ def handle_chat_input(prompt):
     add_chat_message("assistant", full_response)
     
     # Log the chat interaction ID or sequence number for correlation
-    logger.info(f"Chat interaction #{len(st.session_state.chat_history)//2} completed")
\ No newline at end of file
+    logger.info(f"Chat interaction #{len(history)//2} completed")
\ No newline at end of file
@@ -4,8 +4,23 @@
 DEFAULT_SEGMENT_INTERVAL = 10  # In seconds
 DEFAULT_FRAMES_PER_SECOND = 1
 RESIZE_OF_FRAMES = 4
+MAX_CONCURRENT_SEGMENTS = 4  # Caps in-flight segments to stay within Azure OpenAI rate limits
+JPEG_QUALITY = 70  # GPT-4o downsamples images itself, so higher quality only inflates the payload
+DUPLICATE_FRAME_THRESHOLD = 5  # Hash bits a frame must differ by from the last kept frame to be sent; 0 keeps every frame
 DEFAULT_TEMPERATURE = 0.5
 
+# Chat budgets; older segments and turns beyond these are dropped from the request
+CHAT_CONTEXT_MAX_TOKENS = 6000
+CHAT_HISTORY_MAX_TOKENS = 2000
+CHAT_HISTORY_MAX_TURNS = 8
+
+# External tools; if FFMPEG_BINARY is not on PATH, the FFmpeg bundled with imageio-ffmpeg (via MoviePy) is used
+FFMPEG_BINARY = "ffmpeg"
+FFPROBE_BINARY = "ffprobe"
+
+# Hardware decode devices to try, in order of preference (e.g. "cuda" uses NVDEC). Empty tuple disables hardware decode.
+HWACCEL_DEVICE_TYPES = ("cuda", "videotoolbox", "qsv", "vaapi")
+
 # System prompts
 VIDEO_ANALYSIS_SYSTEM_PROMPT = """You are an expert video analyst. You will be shown frames from a video segment. 
 Analyze what is happening in detail, considering both visual elements and any provided audio transcription.
@@ -1,18 +1,104 @@
-import json
+import functools
 import streamlit as st
 import logging
-from config import CHAT_SYSTEM_PROMPT
+from config import CHAT_SYSTEM_PROMPT, CHAT_CONTEXT_MAX_TOKENS, CHAT_HISTORY_MAX_TOKENS
+from utils.api_clients import ANALYSIS_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
-def analyze_video(base64frames, system_prompt, user_prompt, transcription, previous_summary, start_time, end_time, total_duration, temperature):
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the GPT-4o tokenizer once; None if tiktoken or its encoding data is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model("gpt-4o")
+    except Exception as ex:
+        logger.warning(f"Tokenizer unavailable, chat context will not be truncated: {ex}")
+        return None
+
+def fit_blocks(blocks, max_tokens):
+    """Join the most recent whole ``blocks`` that fit within ``max_tokens``.
+
+    Older blocks are dropped from the front. If even the most recent block does not fit,
+    its beginning is kept, so its heading survives.
+    """
+    text = "".join(blocks)
+    # Tokens are byte-level and every token spans at least one byte, so text with no more
+    # UTF-8 bytes than the budget never needs encoding (one character can be several tokens)
+    if len(text.encode("utf-8")) <= max_tokens:
+        return text
+    enc = _get_encoding()
+    if enc is None:
+        return text
+    # Count everything as plain text; with tiktoken's defaults, a special-token string such as
+    # "<|endoftext|>" in an analysis or chat message would raise
+    kept = []
+    used = 0
+    for block in reversed(blocks):
+        used += len(enc.encode(block, disallowed_special=()))
+        if used > max_tokens:
+            break
+        kept.append(block)
+    if not kept and blocks:
+        return enc.decode(enc.encode(blocks[-1], disallowed_special=())[:max_tokens])
+    kept.reverse()
+    return "".join(kept)
+
+def _trim_history(chat_history, max_tokens):
+    """Keep the most recent chat turns that fit within ``max_tokens``.
+
+    Whole turns (a user message and the replies to it) are kept or dropped together, so the
+    history never starts with a reply whose question was cut.
+    """
+    enc = _get_encoding()
+    if enc is None:
+        return chat_history
+    kept = []
+    turn = []
+    used = 0
+    for message in reversed(chat_history):
+        used += len(enc.encode(message["content"], disallowed_special=()))
+        if used > max_tokens:
+            break
+        turn.append(message)
+        if message["role"] == "user":
+            kept.extend(turn)
+            turn = []
+    kept.reverse()
+    return kept
+
+def format_segment_context(analysis, include_transcription=False):
+    """Format one segment analysis as a block of the chat context."""
+    block = f"Segment {analysis['segment']} ({analysis['start_time']}-{analysis['end_time']} seconds):\n{analysis['analysis']}\n"
+    if include_transcription and analysis.get("transcription"):
+        block += f"Transcription: {analysis['transcription']}\n"
+    return block + "\n"
+
+def get_segment_contexts(analyses, include_transcription=False):
+    """Get the formatted context block of each analysis.
+
+    Each block is formatted once and stored on its analysis dict (under ``_formatted`` or
+    ``_formatted_with_tx``), so later chat turns only join the precomputed strings.
+    """
+    key = "_formatted_with_tx" if include_transcription else "_formatted"
+    blocks = []
+    for analysis in analyses:
+        block = analysis.get(key)
+        if block is None:
+            block = analysis[key] = format_segment_context(analysis, include_transcription)
+        blocks.append(block)
+    return blocks
+
+async def analyze_video(base64frames, system_prompt, user_prompt, transcription, previous_summary, start_time, end_time, total_duration, temperature,
+                        client=None):
     """Analyze video frames with GPT-4o Vision, incorporating context from previous segments."""
+    client = client or st.session_state.aoai_async_client
     try:
-        # Construct content array with frames
+        # Construct content array with frames; uploaded frames are already URLs, the rest are sent inline
         content = [
             *map(lambda x: {
                 "type": "image_url",
-                "image_url": {"url": f'data:image/jpg;base64,{x}', "detail": "auto"}
+                "image_url": {"url": x if x.startswith("https://") else f'data:image/jpg;base64,{x}', "detail": "auto"}
             }, base64frames)
         ]
 
@@ -25,7 +111,7 @@ def analyze_video(base64frames, system_prompt, user_prompt, transcription, previ
 
         content.append({"type": "text", "text": segment_context})
 
-        response = st.session_state.aoai_client.chat.completions.create(
+        response = await client.chat.completions.create(
             model=st.session_state.aoai_model_name,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -33,59 +119,91 @@ def analyze_video(base64frames, system_prompt, user_prompt, transcription, previ
                 {"role": "user", "content": content}
             ],
             temperature=temperature,
-            max_tokens=4096
+            max_tokens=4096,
+            timeout=ANALYSIS_TIMEOUT
         )
 
-        json_response = json.loads(response.model_dump_json())
-        return json_response['choices'][0]['message']['content']
+        return response.choices[0].message.content
 
     except Exception as ex:
         logger.error(f'ERROR in analyze_video: {ex}')
         return f'ERROR: {ex}'
 
-def chat_with_video_analysis(query, analyses, chat_history=None, temperature=0.7, summarize_first=True):
-    """Use GPT-4o to answer questions about the video using the collected analyses."""
+@st.cache_data(show_spinner=False, max_entries=32)
+def summarize_analyses(summary_prompt, temperature, model_name, endpoint, _client):
+    """Summarize segment analyses into an overview.
+
+    Cached across reruns and sessions, so identical analyses (e.g. a previously analyzed
+    video loaded again) are only summarized once. ``endpoint`` and ``model_name`` are part of
+    the cache key, so a summary is only reused for the same deployment; ``_client`` is not hashed.
+    """
+    summary_response = _client.chat.completions.create(
+        model=model_name,
+        messages=[
+            {"role": "system", "content": "Create a concise summary of the video based on these segment analyses."},
+            {"role": "user", "content": summary_prompt}
+        ],
+        temperature=temperature,
+        max_tokens=1000
+    )
+    return summary_response.choices[0].message.content
+
+def _build_chat_context(analyses, segment_contexts, temperature, summarize_first):
+    """Build the chat context: an optional overall summary followed by the segment analyses."""
+    # Construct context from analyses
+    context = "Video Analysis Context:\n\n"
+    
+    if summarize_first and len(analyses) > 1:
+        # First create a summary of all segments to provide a high-level overview
+        summary_prompt = "Summarize the following video analysis segments into a coherent overview:\n\n" + "".join(
+            f"Segment {analysis['segment']} ({analysis['start_time']}-{analysis['end_time']} seconds):\n"
+            f"{analysis['analysis']}...\n\n"
+            for analysis in analyses
+        )
+
+        client = st.session_state.aoai_client
+        summary = summarize_analyses(summary_prompt, temperature, st.session_state.aoai_model_name,
+                                     str(client.base_url), client)
+        context += "Overall Summary:\n" + summary + "\n\n"
+
+    # Add individual segment analyses, keeping the most recent whole segments within the token budget
+    context += fit_blocks(segment_contexts, CHAT_CONTEXT_MAX_TOKENS)
+    
+    return context
+
+def chat_with_video_analysis(query, analyses, chat_history=None, temperature=0.7, summarize_first=True,
+                             segment_contexts=None):
+    """Use GPT-4o to answer questions about the video using the collected analyses.
+
+    ``segment_contexts`` may hold the preformatted context block of each analysis
+    (see get_segment_contexts); otherwise they are formatted here.
+    """
     try:
-        # Construct context from analyses
-        context = "Video Analysis Context:\n\n"
-        
-        if summarize_first and len(analyses) > 1:
-            # First create a summary of all segments to provide a high-level overview
-            summary_prompt = "Summarize the following video analysis segments into a coherent overview:\n\n"
-            for analysis in analyses:
-                summary_prompt += f"Segment {analysis['segment']} ({analysis['start_time']}-{analysis['end_time']} seconds):\n"
-                summary_prompt += f"{analysis['analysis']}...\n\n"
-                
-            summary_response = st.session_state.aoai_client.chat.completions.create(
-                model=st.session_state.aoai_model_name,
-                messages=[
-                    {"role": "system", "content": "Create a concise summary of the video based on these segment analyses."},
-                    {"role": "user", "content": summary_prompt}
-                ],
-                temperature=temperature,
-                max_tokens=1000
-            )
-            
-            summary_json = json.loads(summary_response.model_dump_json())
-            context += "Overall Summary:\n" + summary_json['choices'][0]['message']['content'] + "\n\n"
-
-        # Add individual segment analyses
-        for analysis in analyses:
-            context += f"Segment {analysis['segment']} ({analysis['start_time']}-{analysis['end_time']} seconds):\n"
-            context += f"{analysis['analysis']}\n\n"
-
-        # Construct messages array with chat history
-        messages = [
-            {"role": "system", "content": st.session_state.chat_config.get("chat_system_prompt", CHAT_SYSTEM_PROMPT)},
-            {"role": "user", "content": f"Here is the video analysis to reference:\n{context}"}
-        ]
+        if segment_contexts is None:
+            segment_contexts = [format_segment_context(analysis) for analysis in analyses]
+        segments_text = "".join(segment_contexts)
 
-        # Add chat history if it exists
-        if chat_history:
-            messages.extend(chat_history)
+        # The system prompt and context only change when the segments or settings do, so reuse them
+        # across chat turns. Keeping them first and unchanged also lets the service's prompt caching
+        # reuse the prefix.
+        system_prompt = st.session_state.chat_config.get("chat_system_prompt", CHAT_SYSTEM_PROMPT)
+        # The summary in the context depends on the deployment too, so a change of API settings rebuilds it
+        prefix_key = (segments_text, summarize_first, temperature, system_prompt,
+                      st.session_state.aoai_model_name, str(st.session_state.aoai_client.base_url))
+        cached_prefix = st.session_state.get("chat_prefix")
+        if cached_prefix is not None and cached_prefix[0] == prefix_key:
+            prefix_messages = cached_prefix[1]
+        else:
+            context = _build_chat_context(analyses, segment_contexts, temperature, summarize_first)
+            prefix_messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Here is the video analysis to reference:\n{context}"}
+            ]
+            st.session_state.chat_prefix = (prefix_key, prefix_messages)
 
-        # Add current query
-        messages.append({"role": "user", "content": query})
+        # Add the chat history, if any, and the current query
+        messages = [*prefix_messages, *_trim_history(chat_history or [], CHAT_HISTORY_MAX_TOKENS),
+                    {"role": "user", "content": query}]
 
         # Return streaming response
         response = st.session_state.aoai_client.chat.completions.create(
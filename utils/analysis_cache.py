@@ -1,9 +1,13 @@
 import os
 import time
+import re
 import json
 import hashlib
+import uuid
 import logging
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+import orjson
 
 # Set up logger for this component
 logger = logging.getLogger('cache')
@@ -11,6 +15,12 @@ logger = logging.getLogger('cache')
 # Path to the file that stores video analysis metadata
 CACHE_FILE = os.path.join("video", "analysis_cache.json")
 
+# Matches per-segment analysis files written by execute_video_processing
+ANALYSIS_FILE_PATTERN = re.compile(r"^segment_(\d+)_analysis\.json$")
+
+# Directory of Whisper transcriptions, keyed by a hash of the audio sent
+TRANSCRIPTION_CACHE_DIR = os.path.join("video", "transcriptions")
+
 def ensure_cache_file():
     """Ensure the cache file exists."""
     logger.debug(f"Ensuring cache file exists at: {CACHE_FILE}")
@@ -179,7 +189,28 @@ def register_url_analysis(url, analysis_dir, start_time=0, end_time=0):
     
     save_analysis_cache(cache)
 
-def load_previous_analysis(analysis_dir: str) -> Dict:
+def list_analysis_files(analysis_dir: str) -> List[str]:
+    """List segment analysis filenames in a directory, ordered by segment number."""
+    files = []
+    with os.scandir(analysis_dir) as entries:
+        for entry in entries:
+            match = ANALYSIS_FILE_PATTERN.match(entry.name)
+            if match and entry.is_file():
+                files.append((int(match.group(1)), entry.name))
+    return [name for _, name in sorted(files)]
+
+def load_all_analyses(analysis_subdir: str) -> List[Dict]:
+    """Load all segment analyses saved in a directory, in segment order."""
+    analyses = []
+    try:
+        for file in list_analysis_files(analysis_subdir):
+            with open(os.path.join(analysis_subdir, file), 'rb') as f:
+                analyses.append(orjson.loads(f.read()))
+    except Exception as ex:
+        logger.error(f"Error loading analyses: {ex}")
+    return analyses
+
+def load_previous_analysis(analysis_dir: str) -> List[Dict]:
     """
     Load the previous analysis results.
     
@@ -187,23 +218,9 @@ def load_previous_analysis(analysis_dir: str) -> Dict:
         analysis_dir: The path to the analysis directory
         
     Returns:
-        A dictionary with the analysis results
+        A list of the segment analyses, in segment order
     """
-    analyses = []
-    try:
-        # This would load the analysis files similar to load_all_analyses in video_processing.py
-        analysis_subdir = os.path.join(analysis_dir, "analysis")
-        files = sorted([f for f in os.listdir(analysis_subdir) if f.endswith('_analysis.json')])
-        
-        for file in files:
-            with open(os.path.join(analysis_subdir, file), 'r') as f:
-                analysis_data = json.load(f)
-                analyses.append(analysis_data)
-                
-        return analyses
-    except Exception as ex:
-        logger.error(f"Error loading previous analysis: {ex}")
-        return []
+    return load_all_analyses(os.path.join(analysis_dir, "analysis"))
 
 def get_all_previous_analyses():
     """
@@ -239,3 +256,41 @@ def get_all_previous_analyses():
     # Sort by timestamp, newest first
     analyses.sort(key=lambda x: x["timestamp"], reverse=True)
     return analyses
+
+def compute_audio_key(audio_bytes: bytes, model_name: str) -> str:
+    """Compute a content-addressable key for a transcription of the given audio."""
+    return hashlib.sha256(model_name.encode() + b"\0" + audio_bytes).hexdigest()
+
+def get_cached_transcription(audio_key: str) -> Optional[str]:
+    """
+    Look up a previously saved transcription.
+    
+    Args:
+        audio_key: The key from compute_audio_key
+        
+    Returns:
+        The transcription text, or None if the audio has not been transcribed before
+    """
+    path = os.path.join(TRANSCRIPTION_CACHE_DIR, f"{audio_key}.txt")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            logger.debug(f"Transcription cache hit: {audio_key}")
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error(f"Error reading cached transcription: {str(e)}")
+        return None
+
+def save_transcription(audio_key: str, text: str):
+    """Save a transcription so identical audio is not sent to Whisper again."""
+    try:
+        os.makedirs(TRANSCRIPTION_CACHE_DIR, exist_ok=True)
+        path = os.path.join(TRANSCRIPTION_CACHE_DIR, f"{audio_key}.txt")
+        # Write to a temporary file first so concurrent readers never see a partial transcription
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except Exception as e:
+        logger.error(f"Error saving transcription: {str(e)}")
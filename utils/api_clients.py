@@ -1,11 +1,63 @@
 import os
+import functools
+import httpx
 import streamlit as st
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Connection pool shared by the Azure OpenAI and Whisper clients
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+
+# Fail fast on unreachable endpoints instead of the SDK's 10 minute default; reads allow for long completions
+API_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+# Non-streamed segment analyses send nothing until the whole completion (up to 4096 tokens) is done,
+# so their reads get time for a full generation at slow token rates rather than timing out and retrying
+ANALYSIS_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+@functools.lru_cache(maxsize=1)
+def get_http_client():
+    """Get the HTTP/2 client shared by all synchronous API clients, so calls reuse warm connections."""
+    return httpx.Client(http2=True, limits=HTTP_LIMITS)
+
+def create_async_http_client():
+    """Create an HTTP/2 client for async API calls. Its connections are bound to the event loop it is used on."""
+    return httpx.AsyncClient(http2=True, limits=HTTP_LIMITS)
+
+def bind_async_client(client, http_client):
+    """Copy an async API client onto the given HTTP client, or return None if the client is not configured."""
+    return client.with_options(http_client=http_client) if client is not None else None
+
+@st.cache_resource(show_spinner=False)
+def get_api_clients(azure_endpoint, api_key, api_version, azure_deployment=None):
+    """
+    Get the sync and async API clients for an endpoint, creating them once per configuration.
+
+    Args:
+        azure_endpoint: Azure OpenAI endpoint URL
+        api_key: API key for the endpoint
+        api_version: API version to use
+        azure_deployment: Deployment bound to the clients, or None (Whisper passes the model per call)
+
+    Returns:
+        tuple: (AzureOpenAI, AsyncAzureOpenAI)
+    """
+    client_kwargs = dict(
+        api_version=api_version,
+        azure_endpoint=azure_endpoint,
+        api_key=api_key,
+        timeout=API_TIMEOUT
+    )
+    if azure_deployment:
+        client_kwargs["azure_deployment"] = azure_deployment
+    return (
+        AzureOpenAI(**client_kwargs, http_client=get_http_client()),
+        AsyncAzureOpenAI(**client_kwargs)
+    )
+
 def initialize_api_clients():
     """Initialize API clients if they don't exist in session state."""
     if 'api_clients_initialized' not in st.session_state:
@@ -17,11 +69,8 @@ def initialize_api_clients():
             aoai_model_name = os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"]
             
             # Create AOAI client for answer generation
-            st.session_state.aoai_client = AzureOpenAI(
-                azure_deployment=aoai_model_name,
-                api_version=aoai_apiversion,
-                azure_endpoint=aoai_endpoint,
-                api_key=aoai_apikey
+            st.session_state.aoai_client, st.session_state.aoai_async_client = get_api_clients(
+                aoai_endpoint, aoai_apikey, aoai_apiversion, aoai_model_name
             )
             st.session_state.aoai_model_name = aoai_model_name
             
@@ -31,10 +80,8 @@ def initialize_api_clients():
             whisper_apiversion = os.environ["WHISPER_API_VERSION"]
             whisper_model_name = os.environ["WHISPER_DEPLOYMENT_NAME"]
             
-            st.session_state.whisper_client = AzureOpenAI(
-                api_version=whisper_apiversion,
-                azure_endpoint=whisper_endpoint,
-                api_key=whisper_apikey
+            st.session_state.whisper_client, st.session_state.whisper_async_client = get_api_clients(
+                whisper_endpoint, whisper_apikey, whisper_apiversion
             )
             st.session_state.whisper_model_name = whisper_model_name
             
@@ -46,9 +93,12 @@ def initialize_api_clients():
             st.error(f"Failed to initialize API clients: {str(e)}")
             # Create empty placeholders so we don't crash
             st.session_state.aoai_client = None
+            st.session_state.aoai_async_client = None
             st.session_state.whisper_client = None
+            st.session_state.whisper_async_client = None
             st.session_state.api_clients_initialized = False
 
+@functools.lru_cache(maxsize=32)
 def validate_azure_endpoint(endpoint):
     """Validate Azure endpoint format."""
     if not endpoint:
@@ -105,12 +155,9 @@ def update_api_clients():
         # Update Azure OpenAI client if configuration is valid
         if valid_azure and azure_api_key and azure_deployment and azure_api_version:
             try:
-                # Create new client
-                new_aoai_client = AzureOpenAI(
-                    azure_deployment=azure_deployment,
-                    api_version=azure_api_version,
-                    azure_endpoint=azure_endpoint,
-                    api_key=azure_api_key
+                # Get the clients for this configuration (reused if it was applied before)
+                new_aoai_client, new_aoai_async_client = get_api_clients(
+                    azure_endpoint, azure_api_key, azure_api_version, azure_deployment
                 )
                 
                 # Test the new client
@@ -119,6 +166,7 @@ def update_api_clients():
                 if success:
                     # If successful, update the client
                     st.session_state.aoai_client = new_aoai_client
+                    st.session_state.aoai_async_client = new_aoai_async_client
                     st.session_state.aoai_model_name = azure_deployment
                     api_updated = True
                     st.success(f"Azure OpenAI API settings updated successfully: {message}")
@@ -133,11 +181,9 @@ def update_api_clients():
         # Update Whisper client if configuration is valid
         if valid_whisper and whisper_api_key and whisper_deployment and whisper_api_version:
             try:
-                # Create new client
-                new_whisper_client = AzureOpenAI(
-                    api_version=whisper_api_version,
-                    azure_endpoint=whisper_endpoint,
-                    api_key=whisper_api_key
+                # Get the clients for this configuration (reused if it was applied before)
+                new_whisper_client, new_whisper_async_client = get_api_clients(
+                    whisper_endpoint, whisper_api_key, whisper_api_version
                 )
                 
                 # Test the new client (basic validation only)
@@ -146,6 +192,7 @@ def update_api_clients():
                 if success:
                     # If successful, update the client
                     st.session_state.whisper_client = new_whisper_client
+                    st.session_state.whisper_async_client = new_whisper_async_client
                     st.session_state.whisper_model_name = whisper_deployment
                     whisper_updated = True
                     st.success(f"Whisper API settings updated successfully: {message}")
@@ -0,0 +1,91 @@
+import os
+import uuid
+import logging
+import functools
+from datetime import datetime, timedelta, timezone
+
+# Set up logger for this component
+logger = logging.getLogger(__name__)
+
+# How long GPT-4o has to fetch an uploaded frame
+FRAME_SAS_EXPIRY = timedelta(hours=1)
+
+@functools.lru_cache(maxsize=4)
+def _get_container_client(connection_string, container_name):
+    """Create (once per connection string) a client for the frames container."""
+    from azure.storage.blob import BlobServiceClient
+
+    service_client = BlobServiceClient.from_connection_string(connection_string)
+    container_client = service_client.get_container_client(container_name)
+    if not container_client.exists():
+        container_client.create_container()
+        logger.info(f"Created blob container: {container_name}")
+    return container_client
+
+class FrameUploader:
+    """Uploads JPEG frames for one segment and deletes them once the segment has been analyzed."""
+
+    # Blob batch requests accept at most 256 sub-requests
+    DELETE_BATCH_SIZE = 256
+
+    def __init__(self, container_client, container_name, account_key):
+        self.container_client = container_client
+        self.container_name = container_name
+        self.account_key = account_key
+        self.run_prefix = uuid.uuid4().hex
+        self.blob_names = []
+
+    def __call__(self, name, jpeg_bytes):
+        """Upload a frame and return a short-lived read-only SAS URL for it."""
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+        blob_name = f"{self.run_prefix}/{name}"
+        blob_client = self.container_client.get_blob_client(blob_name)
+        blob_client.upload_blob(bytes(jpeg_bytes), overwrite=True)
+        self.blob_names.append(blob_name)
+        sas_token = generate_blob_sas(
+            account_name=blob_client.account_name,
+            container_name=self.container_name,
+            blob_name=blob_name,
+            account_key=self.account_key,
+            permission=BlobSasPermissions(read=True),
+            expiry=datetime.now(timezone.utc) + FRAME_SAS_EXPIRY
+        )
+        return f"{blob_client.url}?{sas_token}"
+
+    def delete_uploaded(self):
+        """Delete every frame uploaded so far; GPT-4o has already fetched them."""
+        blob_names, self.blob_names = self.blob_names, []
+        for i in range(0, len(blob_names), self.DELETE_BATCH_SIZE):
+            try:
+                self.container_client.delete_blobs(*blob_names[i:i + self.DELETE_BATCH_SIZE])
+            except Exception as ex:
+                logger.warning(f"Failed to delete uploaded frames under {self.run_prefix}/: {ex}")
+
+def get_frame_uploader():
+    """
+    Get an uploader that sends JPEG frames to Azure Blob Storage.
+
+    Returns:
+        A FrameUploader, callable as ``upload(name, jpeg_bytes) -> url`` returning a short-lived
+        read-only SAS URL, or None if AZURE_STORAGE_CONNECTION_STRING is not configured or
+        does not hold an account key to sign SAS URLs with
+    """
+    connection_string = os.environ.get("AZURE_STORAGE_CONNECTION_STRING", "")
+    if not connection_string:
+        return None
+
+    container_name = os.environ.get("AZURE_STORAGE_FRAMES_CONTAINER", "frames")
+    try:
+        container_client = _get_container_client(connection_string, container_name)
+    except Exception as ex:
+        logger.error(f"Blob storage unavailable, sending frames inline: {ex}")
+        return None
+
+    # Connection strings holding a SAS token have no account key to sign per-frame SAS URLs with
+    account_key = getattr(container_client.credential, "account_key", None)
+    if not account_key:
+        logger.warning("Blob storage connection string has no account key, sending frames inline")
+        return None
+
+    return FrameUploader(container_client, container_name, account_key)
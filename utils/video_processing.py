@@ -1,192 +1,531 @@
 import cv2
+import numpy as np
 import os
-import base64
+import math
+import pybase64
+import asyncio
+import functools
+import collections
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from moviepy.video.io.ffmpeg_tools import ffmpeg_extract_subclip
-from moviepy.editor import VideoFileClip
 import json
+import orjson
 import time
+import subprocess
+import shutil
+import tempfile
+import threading
+import queue
 import logging
 
-import yt_dlp
+from utils.blob_storage import get_frame_uploader
+from utils.analysis_cache import compute_audio_key, get_cached_transcription, save_transcription
+from utils.api_clients import create_async_http_client, bind_async_client
+from config import JPEG_QUALITY, DUPLICATE_FRAME_THRESHOLD, FFMPEG_BINARY, FFPROBE_BINARY, MAX_CONCURRENT_SEGMENTS, HWACCEL_DEVICE_TYPES
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
-def process_video(video_path, frames_per_second=1, resize=4, output_dir=''):
-    """Extract and encode frames from a video file."""
-    logger.info(f"Processing video: {video_path}")
-    
-    base64Frames = []
+# Frames each segment may have in flight in the encode pool, bounding memory on long segments
+FRAMES_ENCODED_AHEAD = 8
+
+@functools.lru_cache(maxsize=1)
+def _ffmpeg_exe():
+    """Get the FFmpeg executable: FFMPEG_BINARY if it is on PATH, else the one bundled with imageio-ffmpeg.
+
+    imageio-ffmpeg comes with MoviePy, so a pip-only install works without a system FFmpeg.
+    """
+    path = shutil.which(FFMPEG_BINARY)
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        path = imageio_ffmpeg.get_ffmpeg_exe()
+        logger.info(f"{FFMPEG_BINARY} not found on PATH, using the imageio-ffmpeg binary: {path}")
+        return path
+    except Exception as ex:
+        logger.warning(f"{FFMPEG_BINARY} not found on PATH and no bundled FFmpeg available: {ex}")
+        return FFMPEG_BINARY
+
+# Make sure OpenCV dispatches to its SIMD-optimized kernels
+cv2.setUseOptimized(True)
+
+@functools.lru_cache(maxsize=1)
+def _log_opencv_status():
+    """Log OpenCV's SIMD dispatch status, once; called at processing time, after logging is configured."""
+    logger.debug(f"OpenCV {cv2.__version__}: optimized={cv2.useOptimized()}, "
+                 f"AVX2={cv2.checkHardwareSupport(cv2.CPU_AVX2)}, threads={cv2.getNumThreads()}")
+
+def _open_av_container(video_path):
+    """Open a video with PyAV, requesting hardware-accelerated decode when a device is available."""
+    # PyAV is only needed when the FFmpeg pipe is unavailable
+    import av
+
+    try:
+        from av.codec.hwaccel import HWAccel, hwdevices_available
+        available = hwdevices_available()
+        for device_type in HWACCEL_DEVICE_TYPES:
+            if device_type in available:
+                logger.debug(f"Using {device_type} hardware decode for {video_path}")
+                return av.open(video_path, hwaccel=HWAccel(device_type=device_type, allow_software_fallback=True))
+    except Exception as ex:
+        logger.debug(f"Hardware decode unavailable, using software decode: {ex}")
+    return av.open(video_path)
+
+# cv2.rotate codes for a clockwise display rotation, in degrees
+_ROTATE_CODES = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+def _av_rotation(stream, frame):
+    """Get the clockwise display rotation of a PyAV video stream, in degrees."""
+    # Newer PyAV exposes the display matrix (counterclockwise); older files carry a "rotate" tag (clockwise)
+    rotation = getattr(frame, "rotation", None)
+    if rotation:
+        return round(-rotation) % 360
+    return int(stream.metadata.get("rotate", 0) or 0) % 360
+
+def _decode_frames_av(container, frames_per_second):
+    """Yield sampled BGR frames from an open PyAV container, rotated upright like FFmpeg and OpenCV do."""
+    try:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        fps = float(stream.average_rate or stream.guessed_rate or 0)
+        frames_to_skip = max(round(fps / frames_per_second), 1)
+        log_frames = logger.isEnabledFor(logging.DEBUG)
+        rotate_code = None
+
+        for i, frame in enumerate(container.decode(stream)):
+            if i == 0:
+                rotate_code = _ROTATE_CODES.get(_av_rotation(stream, frame))
+            if i % frames_to_skip == 0:
+                if log_frames:
+                    logger.debug(f"Processing frame {i}/{stream.frames}")
+                image = frame.to_ndarray(format="bgr24")
+                yield cv2.rotate(image, rotate_code) if rotate_code is not None else image
+    finally:
+        container.close()
 
+def _decode_frames_cv2(video_path, frames_per_second):
+    """Yield sampled BGR frames using OpenCV's VideoCapture.
+
+    Frames are read sequentially: every frame is grabbed, but only sampled frames are
+    retrieved, so the decoder never has to seek back to a keyframe.
+    """
     video = cv2.VideoCapture(video_path)
     total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
     fps = video.get(cv2.CAP_PROP_FPS)
-    frames_to_skip = int(fps / frames_per_second)
-    curr_frame = 0
-    frame_count = 1
+    frames_to_skip = max(round(fps / frames_per_second), 1)
+    log_frames = logger.isEnabledFor(logging.DEBUG)
+
+    try:
+        for curr_frame in range(total_frames):
+            if not video.grab():
+                break
+            if curr_frame % frames_to_skip:
+                continue
 
-    while curr_frame < total_frames - 1:
-        video.set(cv2.CAP_PROP_POS_FRAMES, curr_frame)
-        success, frame = video.read()
-        if not success:
-            break
+            success, frame = video.retrieve()
+            if not success:
+                break
 
-        logger.debug(f"Processing frame {curr_frame}/{total_frames}")
+            if log_frames:
+                logger.debug(f"Processing frame {curr_frame}/{total_frames}")
+            yield frame
+    finally:
+        video.release()
 
-        if resize != 0:
-            height, width, _ = frame.shape
-            frame = cv2.resize(frame, (width // resize, height // resize))
+def probe_frame_size(video_path):
+    """Return the displayed (width, height) of the first video stream using ffprobe.
 
-        _, buffer = cv2.imencode(".jpg", frame)
+    Width and height are swapped for videos rotated by ±90° (e.g. portrait phone footage),
+    matching the upright frames FFmpeg produces when it applies the rotation.
+    """
+    result = subprocess.run(
+        [FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "stream=width,height:stream_tags=rotate:stream_side_data=rotation",
+         "-of", "json", video_path],
+        capture_output=True, check=True
+    )
+    stream = json.loads(result.stdout)["streams"][0]
+    width, height = int(stream["width"]), int(stream["height"])
 
-        if output_dir:
-            frame_filename = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(video_path))[0]}_frame_{frame_count}.jpg")
+    rotation = int(stream.get("tags", {}).get("rotate", 0) or 0)
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            rotation = int(side_data["rotation"])
+    if rotation % 180:
+        width, height = height, width
+    return width, height
+
+def _stream_frames_ffmpeg(video_path, frames_per_second, resize, frame_size=None):
+    """Yield BGR frames sampled and scaled by FFmpeg, read as raw video from its stdout."""
+    width, height = frame_size or probe_frame_size(video_path)
+    filters = [f"fps={frames_per_second}"]
+    if resize != 0:
+        width, height = width // resize, height // resize
+        filters.append(f"scale={width}:{height}:flags=area")
+    frame_bytes = width * height * 3
+
+    # stderr goes to a file rather than a pipe: nothing drains it while frames are read,
+    # so a chatty decoder could otherwise fill the pipe and stall FFmpeg
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(
+            [_ffmpeg_exe(), "-v", "error", "-i", video_path, "-an", "-sn", "-dn",
+             "-vf", ",".join(filters), "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"],
+            stdout=subprocess.PIPE, stderr=stderr_file, bufsize=frame_bytes
+        )
+        frames_read = 0
+        log_frames = logger.isEnabledFor(logging.DEBUG)
+        try:
+            while True:
+                raw = proc.stdout.read(frame_bytes)
+                if len(raw) < frame_bytes:
+                    break
+                if log_frames:
+                    logger.debug(f"Processing frame {frames_read}")
+                frames_read += 1
+                yield np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 3)
+
+            if proc.wait() != 0 and frames_read == 0:
+                stderr_file.seek(0)
+                raise subprocess.CalledProcessError(proc.returncode, _ffmpeg_exe(), stderr=stderr_file.read())
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+def _decode_frames(video_path, frames_per_second):
+    """Yield sampled frames in-process, preferring PyAV and falling back to OpenCV if PyAV cannot open the file."""
+    try:
+        container = _open_av_container(video_path)
+    except Exception as ex:
+        logger.warning(f"PyAV could not open {video_path}, falling back to OpenCV: {ex}")
+        return _decode_frames_cv2(video_path, frames_per_second)
+    return _decode_frames_av(container, frames_per_second)
+
+def _iter_frames(video_path, frames_per_second, resize, frame_size=None):
+    """Yield sampled, resized frames.
+
+    FFmpeg does the decode, fps sampling and scaling in one filter graph in its own process;
+    if it is unavailable or fails before producing a frame, decode in-process and resize with OpenCV.
+    """
+    frames_read = 0
+    try:
+        for frame in _stream_frames_ffmpeg(video_path, frames_per_second, resize, frame_size):
+            frames_read += 1
+            yield frame
+        return
+    except Exception as ex:
+        if frames_read:
+            raise
+        logger.warning(f"FFmpeg frame pipe failed for {video_path}, decoding in-process: {ex}")
+
+    frames = _decode_frames(video_path, frames_per_second)
+    yield from _resize_frames(frames, resize) if resize != 0 else frames
+
+def _resize_frames(frames, resize):
+    """Downscale a stream of equally sized frames by an integer factor using OpenCV's fastest suitable kernel."""
+    dsize = None
+    for frame in frames:
+        if resize == 2:
+            yield cv2.pyrDown(frame)
+        elif resize == 4:
+            yield cv2.pyrDown(cv2.pyrDown(frame))
+        else:
+            if dsize is None:
+                height, width, _ = frame.shape
+                dsize = (width // resize, height // resize)
+            yield cv2.resize(frame, dsize, interpolation=cv2.INTER_AREA)
+
+def _write_frames(write_queue):
+    """Write queued ``(path, jpeg_buffer)`` pairs to disk until a None sentinel arrives."""
+    log_frames = logger.isEnabledFor(logging.DEBUG)
+    for frame_filename, buffer in iter(write_queue.get, None):
+        try:
             with open(frame_filename, "wb") as f:
                 f.write(buffer)
+            if log_frames:
                 logger.debug(f"Saved frame: {frame_filename}")
-            frame_count += 1
+        except Exception as ex:
+            logger.error(f"Error saving frame {frame_filename}: {ex}")
+
+@functools.lru_cache(maxsize=1)
+def _get_encode_pool():
+    """Get the thread pool, shared by all segments, that JPEG-encodes, base64-encodes and uploads frames."""
+    # cv2.imencode, pybase64 and blob uploads all release the GIL, so these threads run in parallel
+    return ThreadPoolExecutor(thread_name_prefix="frame-encode")
 
-        base64Frames.append(base64.b64encode(buffer).decode("utf-8"))
-        curr_frame += frames_to_skip
-    video.release()
+def _encode_frame(frame, encode_params, frame_name, frame_uploader=None):
+    """JPEG-encode a frame and prepare it for GPT-4o. Returns the JPEG buffer and its URL or base64 string."""
+    _, buffer = cv2.imencode(".jpg", frame, encode_params)
+    if frame_uploader:
+        try:
+            return buffer, frame_uploader(frame_name, buffer)
+        except Exception as ex:
+            logger.warning(f"Frame upload failed, sending frame inline: {ex}")
+    return buffer, pybase64.b64encode(buffer).decode("ascii")
+
+def _frame_hash(frame):
+    """Compute a 64-bit difference hash (dHash) of a BGR frame, used to spot near-duplicate frames."""
+    gray = cv2.cvtColor(cv2.resize(frame, (9, 8), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    return int.from_bytes(np.packbits(gray[:, 1:] > gray[:, :-1]).tobytes(), "big")
+
+def process_video(video_path, frames_per_second=1, resize=4, output_dir='', frame_uploader=None, frame_size=None):
+    """Extract and encode frames from a video file.
+
+    Frames are returned base64-encoded, or as URLs when a ``frame_uploader`` (see
+    utils.blob_storage.get_frame_uploader) is given. Pass the source ``(width, height)``
+    as ``frame_size`` when it is already known to skip probing the file. Frames that are
+    near-duplicates of the last kept frame (see DUPLICATE_FRAME_THRESHOLD) are skipped.
+    """
+    logger.info(f"Processing video: {video_path}")
+    _log_opencv_status()
     
-    logger.info(f"Extracted {len(base64Frames)} frames")
+    base64Frames = []
+    video_stem = os.path.splitext(os.path.basename(video_path))[0]
+    # Optimized Huffman tables shrink each JPEG a few percent more at negligible encode cost
+    encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY, int(cv2.IMWRITE_JPEG_OPTIMIZE), 1]
+
+    # Saved frames are written by a background thread so disk I/O overlaps decoding the next frame
+    if output_dir:
+        write_queue = queue.Queue(maxsize=32)
+        writer = threading.Thread(target=_write_frames, args=(write_queue,), daemon=True)
+        writer.start()
+
+    # Frames are encoded in the shared pool while the next ones decode; results are collected in order
+    encode_pool = _get_encode_pool()
+    pending = collections.deque()
+    last_hash = None
+    skipped_frames = 0
+
+    def collect_frame():
+        frame_name, future = pending.popleft()
+        buffer, payload = future.result()
+        if output_dir:
+            write_queue.put((os.path.join(output_dir, frame_name), buffer))
+        base64Frames.append(payload)
+
+    try:
+        for frame_index, frame in enumerate(_iter_frames(video_path, frames_per_second, resize, frame_size), start=1):
+            # Static shots and slides repeat the same image; don't pay to encode and send it again
+            if DUPLICATE_FRAME_THRESHOLD:
+                frame_hash = _frame_hash(frame)
+                if last_hash is not None and bin(frame_hash ^ last_hash).count("1") < DUPLICATE_FRAME_THRESHOLD:
+                    skipped_frames += 1
+                    continue
+                last_hash = frame_hash
+
+            frame_name = f"{video_stem}_frame_{frame_index}.jpg"
+            pending.append((frame_name, encode_pool.submit(_encode_frame, frame, encode_params, frame_name, frame_uploader)))
+            if len(pending) >= FRAMES_ENCODED_AHEAD:
+                collect_frame()
+        while pending:
+            collect_frame()
+    finally:
+        if output_dir:
+            write_queue.put(None)
+            writer.join()
+    
+    logger.info(f"Extracted {len(base64Frames)} frames, skipped {skipped_frames} near-duplicates")
     return base64Frames
 
-def process_audio(video_path):
-    """Extract and transcribe audio from a video file."""
+# Whisper resamples to 16 kHz mono itself, so anything more only inflates the upload
+AUDIO_ENCODE_ARGS = ["-vn", "-ac", "1", "-ar", "16000", "-acodec", "libmp3lame", "-b:a", "32k", "-f", "mp3"]
+
+def has_audio_stream(video_path):
+    """Check with ffprobe whether a video has an audio stream, without decoding anything."""
+    result = subprocess.run(
+        [FFPROBE_BINARY, "-v", "error", "-select_streams", "a", "-show_entries", "stream=index",
+         "-of", "csv=p=0", video_path],
+        capture_output=True, check=True
+    )
+    return bool(result.stdout.strip())
+
+def segment_audio_path(segment_path):
+    """Path of the MP3 that split_segment writes alongside a segment."""
+    return f"{os.path.splitext(segment_path)[0]}.mp3"
+
+def split_segment(video_path, start_time, end_time, segment_path, with_audio=False):
+    """Cut a segment out of a video by stream copy.
+
+    With ``with_audio``, the same FFmpeg pass also encodes the segment's audio for Whisper to
+    segment_audio_path(segment_path), so transcription does not have to reopen the segment.
+    """
+    duration = f"{end_time - start_time:.2f}"
+    command = [_ffmpeg_exe(), "-v", "error", "-y", "-ss", f"{start_time:.2f}", "-i", video_path,
+               "-t", duration, "-map", "0", "-c", "copy", segment_path]
+    audio_path = segment_audio_path(segment_path)
+    if with_audio:
+        command += ["-t", duration, "-map", "0:a:0", *AUDIO_ENCODE_ARGS, audio_path]
+    elif os.path.exists(audio_path):
+        # Don't let a previous run's audio stand in for this segment
+        os.remove(audio_path)
+    subprocess.run(command, capture_output=True, check=True)
+
+def extract_audio(video_path):
+    """Extract the audio track of a video as 16 kHz mono, 32 kbps MP3 bytes. Returns None if there is no audio.
+
+    Reuses the MP3 written by split_segment when there is one.
+    """
+    audio_path = segment_audio_path(video_path)
+    if os.path.exists(audio_path):
+        with open(audio_path, "rb") as f:
+            return f.read()
+
+    result = subprocess.run(
+        [_ffmpeg_exe(), "-v", "error", "-i", video_path, "-map", "0:a:0?", *AUDIO_ENCODE_ARGS, "pipe:1"],
+        capture_output=True
+    )
+    if not result.stdout:
+        logger.info(f"No audio track found in {video_path}")
+        logger.debug(f"FFmpeg output: {result.stderr.decode(errors='replace')}")
+        return None
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, _ffmpeg_exe(), stderr=result.stderr)
+    logger.info(f"Extracted {len(result.stdout)} bytes of audio from {video_path}")
+    return result.stdout
+
+async def process_audio(video_path, cpu_pool=None, client=None, api_semaphore=None):
+    """Extract and transcribe audio from a video file.
+
+    ``api_semaphore`` is only held for the Whisper request, not while the audio is extracted.
+    """
+    client = client or st.session_state.whisper_async_client
+    api_semaphore = api_semaphore or asyncio.Semaphore(MAX_CONCURRENT_SEGMENTS)
     logger.info(f"Starting audio transcription for {video_path}")
     transcription_text = ''
     
     try:
-        # First check if the video file exists and has audio
-        clip = VideoFileClip(video_path)
-        if not clip.audio:
-            logger.info(f"No audio track found in {video_path}")
-            clip.close()
+        # Extraction is a blocking FFmpeg call, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        audio_bytes = await loop.run_in_executor(cpu_pool, extract_audio, video_path)
+        if audio_bytes is None:
             return "No audio found in this segment."
-
-        # Extract audio to file in the same directory as the video
-        base_video_path, _ = os.path.splitext(video_path)
-        audio_path = f"{base_video_path}.mp3"
-        
-        try:
-            clip.audio.write_audiofile(audio_path, bitrate="32k", verbose=False, logger=None)
-            clip.audio.close()
-            clip.close()
-            logger.info(f"Extracted audio to {audio_path}")
-
-            # Transcribe the audio
-            with open(audio_path, "rb") as audio_file:
-                transcription = st.session_state.whisper_client.audio.transcriptions.create(
-                    model=st.session_state.whisper_model_name,
-                    file=audio_file
-                )
-                transcription_text = transcription.text
-                logger.info(f"Transcription successful: {transcription_text}")
-                logger.info(f"Audio file saved at: {audio_path}")
-
-        except Exception as ex:
-            logger.error(f'ERROR in audio processing: {str(ex)}')
-            if os.path.exists(audio_path):
-                os.remove(audio_path)  # Only remove on error
-            
     except Exception as ex:
         logger.error(f'ERROR processing audio: {str(ex)}')
-        transcription_text = "Audio processing failed."
+        return "Audio processing failed."
 
-    return transcription_text
+    # Re-running a segment (e.g. with a new prompt) produces the same audio, so reuse its transcription
+    audio_key = compute_audio_key(audio_bytes, st.session_state.whisper_model_name)
+    cached_text = get_cached_transcription(audio_key)
+    if cached_text is not None:
+        logger.info(f"Using cached transcription for {video_path}")
+        return cached_text
 
-def load_segment_summary(analysis_dir, segment_num):
-    """Load the analysis summary from a previous segment."""
     try:
-        files = sorted([f for f in os.listdir(analysis_dir) if f.endswith('_analysis.json')])
-        if segment_num > 0 and segment_num <= len(files):
-            previous_file = os.path.join(analysis_dir, files[segment_num - 1])
-            with open(previous_file, 'r') as f:
-                analysis_data = json.load(f)
-                return analysis_data.get('summary', '')
+        # Upload the in-memory MP3 directly; nothing is written to disk
+        audio_name = f"{os.path.splitext(os.path.basename(video_path))[0]}.mp3"
+        async with api_semaphore:
+            transcription = await client.audio.transcriptions.create(
+                model=st.session_state.whisper_model_name,
+                file=(audio_name, audio_bytes, "audio/mpeg")
+            )
+        transcription_text = transcription.text
+        logger.info(f"Transcription successful: {transcription_text}")
+        save_transcription(audio_key, transcription_text)
+
     except Exception as ex:
-        logger.error(f"Error loading previous summary: {ex}")
-    return ''
+        logger.error(f'ERROR in audio processing: {str(ex)}')
+
+    return transcription_text
+
+async def execute_video_processing(st, segment_path, system_prompt, user_prompt, temperature, frames_per_second, 
+                          analysis_dir, segment_num=0, total_duration=0, segment_container=None,
+                          cpu_pool=None, api_semaphore=None, previous_segment_done=None, frame_size=None,
+                          aoai_client=None, whisper_client=None):
+    """Process a video segment.
 
-def execute_video_processing(st, segment_path, system_prompt, user_prompt, temperature, frames_per_second, 
-                          analysis_dir, segment_num=0, total_duration=0):
-    """Process a video segment, incorporating previous segment context."""
-    from utils.analysis import analyze_video
+    Frame extraction, transcription and the GPT-4o analysis run as soon as they can; saving the
+    result waits on ``previous_segment_done`` so that segments are committed in order.
+    """
+    from utils.analysis import analyze_video, get_segment_contexts
     
     logger.info(f"Processing segment {segment_num + 1} from {segment_path}")
+    segment_container = segment_container or st.container()
+    api_semaphore = api_semaphore or asyncio.Semaphore(MAX_CONCURRENT_SEGMENTS)
+    loop = asyncio.get_running_loop()
     
     # Get video name from path
     video_folder = os.path.basename(os.path.dirname(os.path.dirname(segment_path)))
     video_name = video_folder.replace("_analysis", "").replace("_", " ")
     
-    # Create a segment subcontainer to keep each segment's content organized
-    segment_subcontainer = st.container()
+    # Get the segment timing information
+    filename = os.path.splitext(os.path.basename(segment_path))[0]
+    timing = filename.split('_')[-1]
+    start_time, end_time = map(float, timing.split('-'))
     
-    with segment_subcontainer:
-        # Add prominent video name and segment information
-        st.markdown(f"## 🎬 {video_name}")
-        st.markdown(f"### Processing segment {segment_num + 1}:")
-        
-        # Get the segment timing information
-        filename = os.path.basename(segment_path)
-        timing = filename.split('_')[-1].replace('.mp4', '')
-        start_time, end_time = map(float, timing.split('-'))
-        st.markdown(f"**Segment Time Range**: {start_time:.1f}s - {end_time:.1f}s")
-        
-        # Show the video segment
-        st.video(segment_path)
+    # Add prominent video name and segment information. Other segments render concurrently,
+    # so write to this segment's container directly rather than entering it with `with`.
+    segment_container.markdown(f"## 🎬 {video_name}")
+    segment_container.markdown(f"### Processing segment {segment_num + 1}:")
+    segment_container.markdown(f"**Segment Time Range**: {start_time:.1f}s - {end_time:.1f}s")
+    segment_container.video(segment_path)
+    status = segment_container.empty()
     
-    # Get the segment timing information for processing
-    filename = os.path.basename(segment_path)
-    timing = filename.split('_')[-1].replace('.mp4', '')
-    start_time, end_time = map(float, timing.split('-'))
+    # Extract frames and transcribe audio concurrently; only the analysis needs both
+    transcribe_audio = st.session_state.config["audio_transcription"]
+    status.info(f"Extracting frames{' and transcribing audio' if transcribe_audio else ''} for {video_name} - "
+                f"segment {segment_num + 1} ({start_time:.1f}s - {end_time:.1f}s)...")
     
-    with st.spinner(f"Analyzing {video_name} - segment {segment_num + 1} ({start_time:.1f}s - {end_time:.1f}s)"):
-        # Extract frames
-        with st.spinner("Extracting frames..."):
-            start_time_proc = time.time()
-            
-            if st.session_state.config["save_frames"]:
-                video_analysis_dir = os.path.dirname(analysis_dir)
-                frames_dir = os.path.join(video_analysis_dir, "frames")
-                os.makedirs(frames_dir, exist_ok=True)
-                logger.debug(f"Using frames directory: {frames_dir}")
-                output_dir = frames_dir
-            else:
-                output_dir = ''
-                
-            base64frames = process_video(segment_path, frames_per_second, 
-                                      resize=st.session_state.config["resize"], output_dir=output_dir)
-            logger.info(f"Frame extraction took {(time.time() - start_time_proc):.3f} seconds")
-            
-        # Get audio transcription if enabled
-        if st.session_state.config["audio_transcription"]:
-            with st.spinner("Transcribing audio..."):
-                start_time_proc = time.time()
-                transcription = process_audio(segment_path)
-                logger.info(f"Audio transcription took {(time.time() - start_time_proc):.3f} seconds")
-        else:
-            transcription = ''
+    if st.session_state.config["save_frames"]:
+        video_analysis_dir = os.path.dirname(analysis_dir)
+        frames_dir = os.path.join(video_analysis_dir, "frames")
+        os.makedirs(frames_dir, exist_ok=True)
+        logger.debug(f"Using frames directory: {frames_dir}")
+        output_dir = frames_dir
+    else:
+        output_dir = ''
+    
+    frame_uploader = get_frame_uploader()
 
-        # Load previous segment summary for context
-        previous_summary = load_segment_summary(analysis_dir, segment_num)
+    async def extract_frames():
+        start_time_proc = time.time()
+        frames = await loop.run_in_executor(
+            cpu_pool, process_video, segment_path, frames_per_second, st.session_state.config["resize"], output_dir,
+            frame_uploader, frame_size
+        )
+        logger.info(f"Frame extraction took {(time.time() - start_time_proc):.3f} seconds")
+        return frames
+    
+    async def transcribe():
+        if not transcribe_audio:
+            return ''
+        start_time_proc = time.time()
+        text = await process_audio(segment_path, cpu_pool, whisper_client, api_semaphore)
+        logger.info(f"Audio transcription took {(time.time() - start_time_proc):.3f} seconds")
+        return text
+    
+    try:
+        base64frames, transcription = await asyncio.gather(extract_frames(), transcribe())
+
+        # Analyze the segment; segments are analyzed concurrently, so no previous-segment summary is passed
+        status.info(f"Analyzing frames for segment {segment_num + 1}...")
+        start_time_proc = time.time()
+        async with api_semaphore:
+            analysis = await analyze_video(base64frames, system_prompt, user_prompt, transcription, 
+                                           '', start_time, end_time, total_duration, temperature,
+                                           client=aoai_client)
+        logger.info(f"Analysis took {(time.time() - start_time_proc):.3f} seconds")
+    finally:
+        # The analysis has fetched the uploaded frames, so don't leave them in the storage account
+        if frame_uploader is not None:
+            await loop.run_in_executor(cpu_pool, frame_uploader.delete_uploaded)
 
-        # Analyze the segment
-        with st.spinner("Analyzing frames..."):
-            start_time_proc = time.time()
-            analysis = analyze_video(base64frames, system_prompt, user_prompt, transcription, 
-                                  previous_summary, start_time, end_time, total_duration, temperature)
-            logger.info(f"Analysis took {(time.time() - start_time_proc):.3f} seconds")
+    # Commit results in segment order
+    if previous_segment_done is not None:
+        status.info(f"Waiting for segment {segment_num} to finish...")
+        await previous_segment_done
 
     # Show results in the segment subcontainer
-    with segment_subcontainer:
-        st.success(f"Analysis completed for {video_name} - segment {segment_num + 1}")
-        st.markdown(f"**Analysis**: {analysis}", unsafe_allow_html=True)
-        if st.session_state.config["show_transcription"] and st.session_state.config["audio_transcription"] and transcription:
-            st.markdown(f"**Transcription**: {transcription}", unsafe_allow_html=True)
+    status.empty()
+    segment_container.success(f"Analysis completed for {video_name} - segment {segment_num + 1}")
+    segment_container.markdown(f"**Analysis**: {analysis}", unsafe_allow_html=True)
+    if st.session_state.config["show_transcription"] and st.session_state.config["audio_transcription"] and transcription:
+        segment_container.markdown(f"**Transcription**: {transcription}", unsafe_allow_html=True)
     
     # Save analysis results
     analysis_filename = os.path.join(analysis_dir, f"segment_{segment_num+1}_analysis.json")
@@ -195,63 +534,147 @@ def execute_video_processing(st, segment_path, system_prompt, user_prompt, tempe
         "start_time": start_time,
         "end_time": end_time,
         "analysis": analysis,
+        "transcription": transcription if st.session_state.config["audio_transcription"] else None
     }
-    with open(analysis_filename, 'w') as f:
-        json.dump(analysis_data, f, indent=4)
+    with open(analysis_filename, 'wb') as f:
+        f.write(orjson.dumps(analysis_data, option=orjson.OPT_INDENT_2))
         
     # Store in session state for reference
     from models.session_state import add_analysis
-    add_analysis({
-        "segment": segment_num + 1,
-        "start_time": start_time,
-        "end_time": end_time, 
-        "analysis": analysis,
-        "transcription": transcription if st.session_state.config["audio_transcription"] else None
-    })
+    add_analysis(dict(analysis_data))
 
-    # Update session state after each segment is processed
-    analyses = load_all_analyses(analysis_dir)
-    st.session_state.analyses = analyses
+    # Update the chat context in memory; segments commit in order, so no need to re-read the directory.
+    # Format the segment's context blocks now, while the chat is not waiting on them.
+    get_segment_contexts([analysis_data], include_transcription=False)
+    get_segment_contexts([analysis_data], include_transcription=True)
+    st.session_state.analyses.append(analysis_data)
     st.session_state.show_chat = True
 
     return analysis
 
-def load_all_analyses(analysis_dir):
-    """Load all segment analyses for the chat context."""
-    analyses = []
-    try:
-        files = sorted([f for f in os.listdir(analysis_dir) if f.endswith('_analysis.json')])
-        for file in files:
-            with open(os.path.join(analysis_dir, file), 'r') as f:
-                analysis_data = json.load(f)
-                analyses.append(analysis_data)
-    except Exception as ex:
-        logger.error(f"Error loading analyses: {ex}")
-    return analyses
+async def _process_segments_async(st, segment_paths, system_prompt, user_prompt, temperature, frames_per_second,
+                                  analysis_dir, total_duration, progress_bar=None, fetch_segment=None,
+                                  frame_size=None):
+    """Run every segment's pipeline concurrently, chaining results so they commit in order."""
+    loop = asyncio.get_running_loop()
+    api_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEGMENTS)
+    # Segments are admitted in order, a few at a time, so the first segments' downloads and frame
+    # extraction are not queued in the worker pool behind every later segment's jobs
+    segment_slots = asyncio.Semaphore(MAX_CONCURRENT_SEGMENTS)
+    segment_containers = [st.container() for _ in segment_paths]
+    segment_done = [loop.create_future() for _ in segment_paths]
+    completed = 0
+
+    async def run_segment(segment_num, segment_path, cpu_pool):
+        nonlocal completed
+        try:
+            async with segment_slots:
+                if fetch_segment is not None:
+                    fetch_status = segment_containers[segment_num].empty()
+                    fetch_status.info(f"Downloading segment {segment_num + 1}/{len(segment_paths)}...")
+                    segment_path = await loop.run_in_executor(cpu_pool, fetch_segment, segment_path)
+                    fetch_status.empty()
+                return await execute_video_processing(
+                    st, segment_path, system_prompt, user_prompt, temperature, frames_per_second,
+                    analysis_dir, segment_num, total_duration,
+                    segment_container=segment_containers[segment_num],
+                    cpu_pool=cpu_pool,
+                    api_semaphore=api_semaphore,
+                    previous_segment_done=segment_done[segment_num - 1] if segment_num > 0 else None,
+                    frame_size=frame_size,
+                    aoai_client=aoai_client,
+                    whisper_client=whisper_client
+                )
+        except Exception as ex:
+            logger.error(f"Error processing segment {segment_num + 1}: {str(ex)}")
+            segment_containers[segment_num].error(f"Error processing segment {segment_num + 1}: {str(ex)}")
+            return None
+        finally:
+            # Release the next segment even if this one failed
+            segment_done[segment_num].set_result(None)
+            completed += 1
+            if progress_bar is not None:
+                progress_bar.progress(int((completed / len(segment_paths)) * 100))
+
+    # Each run gets its own event loop, so share one HTTP/2 connection pool per run across all segments
+    async with create_async_http_client() as http_client:
+        aoai_client = bind_async_client(st.session_state.aoai_async_client, http_client)
+        whisper_client = bind_async_client(st.session_state.whisper_async_client, http_client)
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SEGMENTS) as cpu_pool:
+            return await asyncio.gather(
+                *(run_segment(segment_num, segment_path, cpu_pool) for segment_num, segment_path in enumerate(segment_paths))
+            )
+
+def process_segments(st, segment_paths, system_prompt, user_prompt, temperature, frames_per_second,
+                     analysis_dir, total_duration, progress_bar=None, fetch_segment=None, frame_size=None):
+    """Process video segments concurrently. Returns each segment's analysis, or None where it failed.
+
+    If given, ``fetch_segment(segment_path)`` runs in the worker pool before a segment is processed
+    (e.g. to download it) and returns the path of the file to process. ``frame_size`` is the
+    ``(width, height)`` shared by all segments, when known, so it is probed once per video.
+    """
+    logger.info(f"Processing {len(segment_paths)} segments with up to {MAX_CONCURRENT_SEGMENTS} concurrent requests")
+    return asyncio.run(_process_segments_async(
+        st, segment_paths, system_prompt, user_prompt, temperature, frames_per_second,
+        analysis_dir, total_duration, progress_bar, fetch_segment, frame_size
+    ))
+
+def _probe_video_buffer(buffer):
+    """Read video stream metadata by piping an in-memory buffer through ffprobe."""
+    result = subprocess.run(
+        [FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "stream=width,height,r_frame_rate,nb_frames,duration",
+         "-of", "json", "pipe:0"],
+        input=buffer, capture_output=True, check=True
+    )
+    stream = json.loads(result.stdout)["streams"][0]
+
+    width = int(stream["width"])
+    height = int(stream["height"])
+    num, den = stream["r_frame_rate"].split("/")
+    fps = float(num) / float(den) if float(den) else 0
+    duration = float(stream.get("duration", 0) or 0)
+    if stream.get("nb_frames", "N/A") != "N/A":
+        frame_count = int(stream["nb_frames"])
+    else:
+        frame_count = int(round(duration * fps))
+    if not duration:
+        duration = frame_count / fps if fps > 0 else 0
+    return width, height, fps, frame_count, duration
+
+def _probe_video_temp_file(video_file, buffer):
+    """Read video metadata with OpenCV from a temporary copy of the uploaded file."""
+    temp_path = f"temp_{video_file.name}"
+    with open(temp_path, "wb") as f:
+        f.write(buffer)
 
-def get_video_file_info(video_file):
-    """Extract metadata from an uploaded video file."""
     try:
-        # Save the file temporarily to get its info
-        temp_path = f"temp_{video_file.name}"
-        with open(temp_path, "wb") as f:
-            f.write(video_file.getbuffer())
-        
-        # Get file size
-        file_size = os.path.getsize(temp_path)
-        file_size_mb = file_size / (1024 * 1024)
-        
-        # Get video metadata using OpenCV
         cap = cv2.VideoCapture(temp_path)
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         fps = cap.get(cv2.CAP_PROP_FPS)
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         duration = frame_count / fps if fps > 0 else 0
-        
-        # Clean up
         cap.release()
+    finally:
         os.remove(temp_path)
+    return width, height, fps, frame_count, duration
+
+def get_video_file_info(video_file):
+    """Extract metadata from an uploaded video file."""
+    try:
+        buffer = video_file.getbuffer()
+        
+        # Get file size
+        file_size = buffer.nbytes
+        file_size_mb = file_size / (1024 * 1024)
+        
+        # Probe the in-memory buffer; containers that need seeking (e.g. moov atom at the end) fall back to a temp file
+        try:
+            width, height, fps, frame_count, duration = _probe_video_buffer(buffer)
+        except Exception as ex:
+            logger.warning(f"ffprobe could not read {video_file.name} from memory, using temporary file: {ex}")
+            width, height, fps, frame_count, duration = _probe_video_temp_file(video_file, buffer)
         
         # Calculate number of segments based on config
         segment_interval = st.session_state.config["segment_interval"]
@@ -259,9 +682,7 @@ def get_video_file_info(video_file):
         start_time = st.session_state.config["start_time"] if enable_range else 0
         end_time = st.session_state.config["end_time"] if enable_range and st.session_state.config["end_time"] > 0 else duration
         
-        total_segments = (end_time - start_time) // segment_interval
-        if (end_time - start_time) % segment_interval > 0:
-            total_segments += 1
+        total_segments = math.ceil((end_time - start_time) / segment_interval) if segment_interval else 0
             
         # Return info dictionary with enhanced information
         return {
@@ -290,6 +711,8 @@ def get_video_file_info(video_file):
 
 def get_video_url_info(url):
     """Extract metadata from a video URL."""
+    import yt_dlp
+
     try:
         ydl_opts = {
             'quiet': True,
@@ -320,9 +743,7 @@ def get_video_url_info(url):
             start_time = st.session_state.config["start_time"] if enable_range else 0
             end_time = st.session_state.config["end_time"] if enable_range and st.session_state.config["end_time"] > 0 else duration
             
-            total_segments = (end_time - start_time) // segment_interval
-            if (end_time - start_time) % segment_interval > 0:
-                total_segments += 1
+            total_segments = math.ceil((end_time - start_time) / segment_interval) if segment_interval else 0
             
             # Return enhanced info dictionary
             return {